@@ -0,0 +1,196 @@
+import os
+from datetime import timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .db_routers import pin_to_primary
+from .models import Order, PriceHistory
+
+ARCHIVE_BATCH_SIZE = 10000
+
+# Cold rows are moved out of the live tables into numpy record files, partitioned
+# by table and month. Each archived batch adds an append-only part file
+# <ARCHIVE_ROOT>/<table>/<YYYY-MM>/<first_id>.npy, so writes never rewrite earlier
+# parts. Rows in a part are sorted by the table's key field and then date, and
+# parts are read memory-mapped, so a lookup by key reads only that key's rows.
+# Money is stored in cents.
+ARCHIVED_TABLES = {
+    'price_history': {
+        'model': PriceHistory,
+        'date_field': 'date',
+        'key_field': 'product_id',
+        'fields': ['id', 'product_id', 'price', 'date'],
+    },
+    'orders': {
+        'model': Order,
+        'date_field': 'date_ordered',
+        'key_field': 'buyer_id',
+        'fields': ['id', 'buyer_id', 'listing_id', 'quantity', 'total_price', 'date_ordered', 'status'],
+    },
+}
+MONEY_FIELDS = {'price', 'total_price'}
+
+
+def archive_root():
+    return getattr(settings, 'ARCHIVE_ROOT', 'archive')
+
+
+def partition_dir(table, month):
+    return os.path.join(archive_root(), table, month)
+
+
+def _dtype(fields):
+    types = []
+    for field in fields:
+        if field.startswith('date'):
+            types.append((field, 'datetime64[us]'))  # Naive UTC
+        elif field == 'status':
+            types.append((field, f"U{Order._meta.get_field('status').max_length}"))
+        else:
+            types.append((field, np.int64))
+    return np.dtype(types)
+
+
+def _to_records(config, rows):
+    records = np.empty(len(rows), dtype=_dtype(config['fields']))
+    for position, field in enumerate(config['fields']):
+        values = [row[position] for row in rows]
+        if field in MONEY_FIELDS:
+            values = [int(value * 100) for value in values]
+        elif field.startswith('date'):
+            values = [value.replace(tzinfo=None) for value in values]
+        records[field] = values
+    return records[np.lexsort((records[config['date_field']], records[config['key_field']]))]
+
+
+def _write_part(table, month, records):
+    directory = partition_dir(table, month)
+    os.makedirs(directory, exist_ok=True)
+    # A rerun after a crash rewrites the same part name; overlapping parts are
+    # de-duplicated by id when read
+    path = os.path.join(directory, f"{records['id'].min()}.npy")
+    temp_path = f'{path}.tmp.npy'
+    np.save(temp_path, records)
+    os.replace(temp_path, path)
+
+
+def archive_rows(table, queryset):
+    """Move the rows of ``queryset`` into the monthly archive files for ``table``."""
+    config = ARCHIVED_TABLES[table]
+    date_field, fields = config['date_field'], config['fields']
+    # Archival reads rows it is about to delete, so it must not read from a lagging replica
+    pin_to_primary()
+
+    archived = 0
+    while True:
+        rows = list(queryset.order_by(date_field).values_list(*fields)[:ARCHIVE_BATCH_SIZE])
+        if not rows:
+            return archived
+
+        date_position = fields.index(date_field)
+        by_month = {}
+        for row in rows:
+            by_month.setdefault(row[date_position].strftime('%Y-%m'), []).append(row)
+        for month, month_rows in by_month.items():
+            _write_part(table, month, _to_records(config, month_rows))
+
+        with transaction.atomic():
+            config['model'].objects.filter(id__in=[row[0] for row in rows]).delete()
+        archived += len(rows)
+
+
+def archive_price_history():
+    # Keep enough raw history for the 30-day pricing window
+    days = getattr(settings, 'PRICE_HISTORY_RETENTION_DAYS', 35)
+    cutoff = timezone.now() - timedelta(days=days)
+    return archive_rows('price_history', PriceHistory.objects.filter(date__lt=cutoff))
+
+
+def archive_closed_orders():
+    days = getattr(settings, 'ORDER_RETENTION_DAYS', 30)
+    statuses = getattr(settings, 'ARCHIVED_ORDER_STATUSES', ['Completed', 'Cancelled'])
+    cutoff = timezone.now() - timedelta(days=days)
+    return archive_rows('orders', Order.objects.filter(status__in=statuses, date_ordered__lt=cutoff))
+
+
+def iter_archive(table, start, end, **filters):
+    """Archived rows of ``table`` with start <= date < end, one month at a time.
+
+    Yields a record array per month partition, oldest month first, sorted by
+    date. ``filters`` are exact matches on archived fields and are applied to
+    each memory-mapped part before anything is copied, so memory follows the
+    matching rows rather than the size of the archive.
+    """
+    config = ARCHIVED_TABLES[table]
+    date_field, key_field = config['date_field'], config['key_field']
+    start64 = np.datetime64(timezone.make_naive(start, dt_timezone.utc), 'us')
+    end64 = np.datetime64(timezone.make_naive(end, dt_timezone.utc), 'us')
+    key = filters.pop(key_field, None)
+
+    month = start.astimezone(dt_timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    while month < end:
+        directory = partition_dir(table, month.strftime('%Y-%m'))
+        names = os.listdir(directory) if os.path.isdir(directory) else []
+        parts = []
+        for name in sorted(names):
+            if name.endswith('.tmp.npy'):
+                continue
+            records = np.load(os.path.join(directory, name), mmap_mode='r')
+            if key is not None:
+                keys = records[key_field]
+                records = records[np.searchsorted(keys, key, 'left'):np.searchsorted(keys, key, 'right')]
+            dates = records[date_field]
+            mask = (dates >= start64) & (dates < end64)
+            for field, value in filters.items():
+                mask &= records[field] == value
+            if mask.any():
+                parts.append(np.asarray(records[mask]))
+        if parts:
+            rows = np.concatenate(parts)
+            # Keep one copy of rows that a rerun archived twice, in date order
+            _, keep = np.unique(rows['id'], return_index=True)
+            yield rows[keep[np.argsort(rows[date_field][keep], kind='stable')]]
+        month = (month + timedelta(days=32)).replace(day=1)
+
+
+def load_archive(table, start, end, **filters):
+    """Record array of the archived rows of ``table`` with start <= date < end matching ``filters``."""
+    months = list(iter_archive(table, start, end, **filters))
+    if not months:
+        return np.empty(0, dtype=_dtype(ARCHIVED_TABLES[table]['fields']))
+    return np.concatenate(months)
+
+
+def price_history_between(product_id, start, end):
+    """(date, price) pairs for a product across archived and live rows, oldest first."""
+    archived = load_archive('price_history', start, end, product_id=product_id)
+    points = [
+        (timezone.make_aware(date.item(), dt_timezone.utc), Decimal(int(cents)).scaleb(-2))
+        for date, cents in zip(archived['date'], archived['price'])
+    ]
+    live = PriceHistory.objects.filter(product_id=product_id, date__gte=start, date__lt=end)
+    points.extend(live.values_list('date', 'price'))
+    return sorted(points)
+
+
+def orders_between(start, end, **filters):
+    """Orders placed in [start, end) from archived and live rows, as dicts.
+
+    ``filters`` are exact matches on archived columns, e.g. ``status='Completed'``.
+    Filtering by ``buyer_id`` reads only that buyer's archived rows.
+    """
+    fields = ARCHIVED_TABLES['orders']['fields']
+    orders = []
+    for record in load_archive('orders', start, end, **filters):
+        order = dict(zip(fields, record.item()))
+        order['total_price'] = Decimal(order['total_price']).scaleb(-2)
+        order['date_ordered'] = timezone.make_aware(order['date_ordered'], dt_timezone.utc)
+        orders.append(order)
+
+    live = Order.objects.filter(date_ordered__gte=start, date_ordered__lt=end, **filters)
+    orders.extend(live.values(*fields))
+    return sorted(orders, key=lambda order: order['date_ordered'])
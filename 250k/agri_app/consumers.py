@@ -1,5 +1,6 @@
 from channels.generic.websocket import AsyncWebsocketConsumer
 import json
+from .price_tape import arecent_prices
 
 class ProductConsumer(AsyncWebsocketConsumer):
     async def connect(self):
@@ -13,6 +14,12 @@ class ProductConsumer(AsyncWebsocketConsumer):
 
         await self.accept()
 
+        # Send the recent price tape so clients can chart before the next update
+        await self.send(text_data=json.dumps({
+            'type': 'snapshot',
+            'prices': await arecent_prices(self.product_id)
+        }))
+
     async def disconnect(self, close_code):
         await self.channel_layer.group_discard(
             self.room_group_name,
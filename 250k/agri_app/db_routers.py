@@ -0,0 +1,97 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+
+PIN_COOKIE = 'pin_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Set once the current request or task has written, so its reads see its own writes
+_pinned_to_primary = ContextVar('pinned_to_primary', default=False)
+# Set by jobs that tolerate replication lag, e.g. the pricing recompute
+_stale_reads_allowed = ContextVar('stale_reads_allowed', default=False)
+
+
+def get_replicas():
+    return getattr(settings, 'REPLICA_DATABASES', [])
+
+
+def pin_to_primary():
+    _pinned_to_primary.set(True)
+
+
+def reset_pinning():
+    _pinned_to_primary.set(False)
+
+
+@contextmanager
+def stale_reads_allowed():
+    # Reads inside this block go to a replica even after a write
+    token = _stale_reads_allowed.set(True)
+    try:
+        yield
+    finally:
+        _stale_reads_allowed.reset(token)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = get_replicas()
+        if not replicas:
+            return 'default'
+        if _pinned_to_primary.get() and not _stale_reads_allowed.get():
+            return 'default'
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        pin_to_primary()
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas mirror the primary, so objects from any alias can be related
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return True
+
+
+@sync_and_async_middleware
+def primary_pinning_middleware(get_response):
+    # Keeps a client on the primary for REPLICATION_LAG_SECONDS after it writes
+    def begin(request):
+        pinned = request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES
+        return _pinned_to_primary.set(pinned)
+
+    def finish(request, response, token):
+        if _pinned_to_primary.get() and PIN_COOKIE not in request.COOKIES:
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=getattr(settings, 'REPLICATION_LAG_SECONDS', 5),
+                httponly=True,
+            )
+        _pinned_to_primary.reset(token)
+        return response
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = begin(request)
+            try:
+                response = await get_response(request)
+            except Exception:
+                _pinned_to_primary.reset(token)
+                raise
+            return finish(request, response, token)
+    else:
+        def middleware(request):
+            token = begin(request)
+            try:
+                response = get_response(request)
+            except Exception:
+                _pinned_to_primary.reset(token)
+                raise
+            return finish(request, response, token)
+
+    return middleware
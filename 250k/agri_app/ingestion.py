@@ -0,0 +1,240 @@
+import csv
+import json
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from .models import Listing, Product, Supplier
+from .tasks import reprice_products
+
+FORMATS = ('csv', 'ndjson')
+BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 100
+REPRICE_CHUNK_SIZE = 1000
+# Rows the database rejects as a batch are retried in halves down to single rows
+WRITE_ERRORS = (DatabaseError, ArithmeticError, ValueError)
+
+QUANTITY_FIELD = Listing._meta.get_field('quantity')
+PRICE_FIELD = Listing._meta.get_field('price')
+
+
+class KeyCache:
+    """Maps natural keys (product name, supplier company name) to primary keys.
+
+    Misses are resolved a batch at a time with one IN query, and unknown keys are
+    remembered so a bad key repeated across the file is looked up only once.
+    """
+
+    def __init__(self, queryset, field):
+        self.queryset = queryset
+        self.field = field
+        self.ids = {}
+
+    def resolve(self, keys):
+        missing = {key for key in keys if key not in self.ids}
+        if missing:
+            found = dict(self.queryset.filter(**{f'{self.field}__in': missing}).values_list(self.field, 'id'))
+            for key in missing:
+                self.ids[key] = found.get(key)
+
+    def get(self, key):
+        return self.ids.get(key)
+
+
+class UnreadableInput(ValueError):
+    """The dump cannot be read past ``line_number``."""
+
+    def __init__(self, line_number, error):
+        super().__init__(f'Unreadable input: {error}')
+        self.line_number = line_number
+
+
+def iter_rows(stream, file_format):
+    # Reads the upload line by line so memory stays flat however large the file is.
+    # Each line is decoded on its own so an encoding error is reported at its line.
+    position = {'line': 0}
+
+    def lines():
+        for raw in stream:
+            position['line'] += 1
+            try:
+                line = raw.decode('utf-8')
+            except UnicodeDecodeError as e:
+                raise UnreadableInput(position['line'], e) from e
+            yield line
+
+    if file_format == 'csv':
+        reader = csv.DictReader(lines())
+        try:
+            # line_num counts physical lines, so quoted fields with newlines keep numbers right
+            for row in reader:
+                yield reader.line_num, row
+        except csv.Error as e:
+            # DictReader.line_num is only updated for rows that parse
+            raise UnreadableInput(reader.reader.line_num, e) from e
+    else:
+        for line_number, line in enumerate(lines(), start=1):
+            if line.strip():
+                yield line_number, line
+
+
+def parse_row(row):
+    if isinstance(row, str):
+        row = json.loads(row)
+    quantity = int(row['quantity'])
+    price = Decimal(str(row['price']))
+
+    # Checked against the Listing columns, so an out-of-range value is rejected
+    # here instead of failing the whole batch in the database
+    min_quantity, max_quantity = connection.ops.integer_field_range(QUANTITY_FIELD.get_internal_type())
+    if not min_quantity <= quantity <= max_quantity:
+        raise ValueError(f'quantity must be between {min_quantity} and {max_quantity}')
+    if not price.is_finite():
+        raise ValueError('price must be a finite number')
+    price = price.quantize(Decimal(1).scaleb(-PRICE_FIELD.decimal_places))
+    max_price = Decimal(10) ** (PRICE_FIELD.max_digits - PRICE_FIELD.decimal_places)
+    if not Decimal('0.01') <= price < max_price:
+        raise ValueError(f'price must be >= 0.01 and < {max_price}')
+    return str(row['product']).strip(), str(row['supplier']).strip(), quantity, price
+
+
+def upsert_listings(listings):
+    if connection.features.supports_update_conflicts_with_target:
+        Listing.objects.bulk_create(
+            listings,
+            update_conflicts=True,
+            unique_fields=['supplier', 'product'],
+            update_fields=['quantity', 'price', 'date_listed'],
+        )
+        return
+
+    # Backends without ON CONFLICT: update the pairs that exist, insert the rest
+    existing = {
+        (supplier_id, product_id): listing_id
+        for listing_id, supplier_id, product_id in Listing.objects.filter(
+            supplier_id__in={listing.supplier_id for listing in listings},
+            product_id__in={listing.product_id for listing in listings},
+        ).values_list('id', 'supplier_id', 'product_id')
+    }
+    to_update, to_create = [], []
+    for listing in listings:
+        listing.id = existing.get((listing.supplier_id, listing.product_id))
+        (to_update if listing.id else to_create).append(listing)
+    Listing.objects.bulk_update(to_update, ['quantity', 'price', 'date_listed'])
+    Listing.objects.bulk_create(to_create)
+
+
+def ingest_listings(stream, file_format='csv', batch_size=BATCH_SIZE, start_line=0, supplier_id=None,
+                    progress=None):
+    """Stream a supplier CSV/NDJSON dump into Listing rows.
+
+    Each batch is committed on its own. A batch the database rejects is retried
+    in halves, so only its bad rows are reported. ``progress`` is called with
+    the stats after every committed batch; its ``last_line`` is the line to pass
+    back as ``start_line`` to resume a killed run. When the file cannot be read
+    to the end, ``stopped_at`` in the stats is the line where reading stopped,
+    and the batches committed before it are still reported and repriced. When
+    ``supplier_id`` is given, rows for any other supplier are rejected.
+    """
+    if file_format not in FORMATS:
+        raise ValueError("Invalid format. Choose 'csv' or 'ndjson'.")
+    products = KeyCache(Product.objects.all(), 'name')
+    suppliers = KeyCache(Supplier.objects.all(), 'company_name')
+    stats = {'rows': 0, 'upserted': 0, 'failed': 0, 'last_line': start_line, 'errors': []}
+    affected_products = set()
+
+    def record_error(line_number, message):
+        stats['failed'] += 1
+        if len(stats['errors']) < MAX_REPORTED_ERRORS:
+            stats['errors'].append({'line': line_number, 'error': message})
+
+    def write(entries):
+        # entries are (line_number, listing) pairs
+        try:
+            with transaction.atomic():
+                upsert_listings([listing for _, listing in entries])
+        except WRITE_ERRORS as e:
+            if len(entries) == 1:
+                record_error(entries[0][0], f'Write failed: {e}')
+                return
+            for _, listing in entries:
+                listing.pk = None  # May have been set by the rolled-back insert
+            middle = len(entries) // 2
+            write(entries[:middle])
+            write(entries[middle:])
+            return
+        stats['upserted'] += len(entries)
+        affected_products.update(listing.product_id for _, listing in entries)
+
+    def flush(batch):
+        products.resolve({row[1] for row in batch})
+        suppliers.resolve({row[2] for row in batch})
+
+        # Later rows for the same supplier and product win within a batch
+        listings = {}
+        now = timezone.now()
+        for line_number, product_name, supplier_name, quantity, price in batch:
+            product_id = products.get(product_name)
+            row_supplier_id = suppliers.get(supplier_name)
+            if product_id is None or row_supplier_id is None:
+                record_error(line_number, f'Unknown product or supplier: {product_name!r}, {supplier_name!r}')
+                continue
+            if supplier_id is not None and row_supplier_id != supplier_id:
+                record_error(line_number, f'Not allowed to update listings of {supplier_name!r}')
+                continue
+            listings[(row_supplier_id, product_id)] = (line_number, Listing(
+                product_id=product_id, supplier_id=row_supplier_id, quantity=quantity, price=price, date_listed=now
+            ))
+
+        write(list(listings.values()))
+        stats['last_line'] = batch[-1][0]
+        if progress is not None:
+            progress(stats)
+
+    def stop(line_number, message):
+        record_error(line_number, message)
+        stats['stopped_at'] = line_number
+
+    started = time.perf_counter()
+    batch = []
+    line_number = start_line
+    try:
+        try:
+            for line_number, row in iter_rows(stream, file_format):
+                if line_number <= start_line:
+                    continue
+                stats['rows'] += 1
+                try:
+                    batch.append((line_number, *parse_row(row)))
+                except (KeyError, TypeError, ValueError, InvalidOperation) as e:
+                    record_error(line_number, f'Invalid row: {e}')
+                    continue
+                if len(batch) >= batch_size:
+                    flush(batch)
+                    batch = []
+        except UnreadableInput as e:
+            # Nothing past this line can be read; the rows before it are still written
+            stop(e.line_number, str(e))
+        if batch:
+            flush(batch)
+            batch = []
+        if stats['rows'] and 'stopped_at' not in stats:
+            stats['last_line'] = line_number
+    except Exception as e:
+        # Keep the report of the batches already committed and queue them for repricing
+        stop(batch[0][0] if batch else line_number, f'Ingestion stopped: {e}')
+
+    elapsed = time.perf_counter() - started
+    stats['seconds'] = round(elapsed, 2)
+    stats['rows_per_sec'] = round(stats['rows'] / elapsed, 1) if elapsed else 0.0
+    stats['repriced_products'] = mark_for_repricing(affected_products)
+    return stats
+
+
+def mark_for_repricing(product_ids):
+    product_ids = sorted(product_ids)
+    for index in range(0, len(product_ids), REPRICE_CHUNK_SIZE):
+        reprice_products.delay(product_ids[index:index + REPRICE_CHUNK_SIZE])
+    return len(product_ids)
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from agri_app.ingestion import BATCH_SIZE, ingest_listings
+
+
+class Command(BaseCommand):
+    help = 'Stream a supplier CSV or NDJSON dump into Listings and queue affected products for repricing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--start-line', type=int, default=0, help='Resume after this line of a previous run')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+
+        def progress(stats):
+            # Printed as each batch commits, so a killed run still shows where to resume
+            self.stdout.write(
+                f"committed through line {stats['last_line']}: "
+                f"{stats['upserted']} listings upserted, {stats['failed']} failed"
+            )
+            self.stdout.flush()
+
+        try:
+            with open(path, 'rb') as stream:
+                stats = ingest_listings(
+                    stream, file_format, options['batch_size'], options['start_line'], progress=progress
+                )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for error in stats['errors']:
+            self.stderr.write(f"line {error['line']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['rows']} rows in {stats['seconds']}s ({stats['rows_per_sec']} rows/sec): "
+            f"{stats['upserted']} listings upserted, {stats['failed']} failed, "
+            f"{stats['repriced_products']} products queued for repricing, last line {stats['last_line']}"
+        ))
+        if 'stopped_at' in stats:
+            raise CommandError(
+                f"stopped at line {stats['stopped_at']}; fix the file and resume with --start-line {stats['last_line']}"
+            )
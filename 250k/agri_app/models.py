@@ -7,7 +7,7 @@ from django.utils import timezone
 # ... copy all your model definitions here ...
 
 class DemandForecast(models.Model):
-    product = models.OneToOneField(Product, on_delete=models.CASCADE)
+    product = models.OneToOneField('Product', on_delete=models.CASCADE)
     predicted_demand = models.FloatField()
     last_updated = models.DateTimeField(auto_now=True)
 
@@ -22,3 +22,47 @@ class Product(models.Model):
 
     def __str__(self):
         return self.name
+
+class PriceHistory(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    date = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # Price history is always read per product over a date range
+        indexes = [models.Index(fields=['product', 'date'])]
+
+class Supplier(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE)
+    company_name = models.CharField(max_length=100)
+    location = models.CharField(max_length=100)
+
+class Listing(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(Decimal('0.01'))])
+    date_listed = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # A supplier's daily dump is a snapshot, so it holds one listing per product
+        constraints = [
+            models.UniqueConstraint(fields=['supplier', 'product'], name='unique_supplier_product_listing'),
+        ]
+
+class Buyer(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE)
+    company_name = models.CharField(max_length=100)
+    location = models.CharField(max_length=100)
+
+class Order(models.Model):
+    buyer = models.ForeignKey(Buyer, on_delete=models.CASCADE)
+    listing = models.ForeignKey(Listing, on_delete=models.PROTECT)
+    quantity = models.PositiveIntegerField()
+    total_price = models.DecimalField(max_digits=10, decimal_places=2)
+    date_ordered = models.DateTimeField(auto_now_add=True)
+    status = models.CharField(max_length=20, default='Pending')
+
+    class Meta:
+        # Pricing reads Pending orders; archival scans closed orders by date
+        indexes = [models.Index(fields=['status', 'date_ordered'])]
@@ -0,0 +1,107 @@
+from datetime import timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Avg, Count, F, Max, Min, RowRange, Window
+from django.db.models.functions import FirstValue, LastValue, TruncDay, TruncHour, TruncWeek
+from django.utils import timezone
+from .archive import iter_archive
+from .models import PriceHistory
+
+RESOLUTIONS = {
+    'hour': TruncHour,
+    'day': TruncDay,
+    'week': TruncWeek,
+}
+
+def ohlc_buckets(product_id, start, end, resolution):
+    # One scan over the (product, date) index: window functions compute OHLC and
+    # average per bucket and DISTINCT collapses the raw rows to one per bucket
+    bucket = RESOLUTIONS[resolution]('date')
+    ordered = {'partition_by': [bucket], 'order_by': F('date').asc()}
+    whole_bucket = {'partition_by': [bucket]}
+
+    return (
+        PriceHistory.objects
+        .filter(product_id=product_id, date__gte=start, date__lt=end)
+        .annotate(
+            bucket=bucket,
+            open=Window(FirstValue('price'), **ordered),
+            close=Window(LastValue('price'), frame=RowRange(start=None, end=None), **ordered),
+            high=Window(Max('price'), **whole_bucket),
+            low=Window(Min('price'), **whole_bucket),
+            average=Window(Avg('price'), **whole_bucket),
+            samples=Window(Count('id'), **whole_bucket),
+        )
+        .values('bucket', 'open', 'high', 'low', 'close', 'average', 'samples')
+        .distinct()
+        .order_by('bucket')
+    )
+
+def truncate(moment, resolution):
+    # Same bucket boundaries as the Trunc functions above, in the current timezone
+    moment = timezone.localtime(moment)
+    if resolution == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if resolution == 'day':
+        return day
+    return day - timedelta(days=day.weekday())
+
+def add_archived_prices(buckets, archived, resolution):
+    for date, cents in zip(archived['date'], archived['price']):
+        bucket = truncate(timezone.make_aware(date.item(), dt_timezone.utc), resolution)
+        price = Decimal(int(cents)).scaleb(-2)
+        row = buckets.get(bucket)
+        if row is None:
+            buckets[bucket] = {
+                'bucket': bucket, 'open': price, 'high': price, 'low': price,
+                'close': price, 'average': price, 'samples': 1,
+            }
+            continue
+        row['high'] = max(row['high'], price)
+        row['low'] = min(row['low'], price)
+        row['close'] = price
+        row['average'] += price  # Running total until the bucket is complete
+        row['samples'] += 1
+
+def archived_ohlc_buckets(product_id, start, end, resolution, limit):
+    # Archived rows are bucketed here a month at a time, in date order. Only the last
+    # bucket can still grow, so reading stops once there are more than `limit`.
+    buckets = {}
+    for archived in iter_archive('price_history', start, end, product_id=product_id):
+        add_archived_prices(buckets, archived, resolution)
+        if len(buckets) > limit:
+            break
+    for row in buckets.values():
+        row['average'] /= row['samples']
+    return list(buckets.values())
+
+def merge_buckets(earlier, later):
+    # A bucket split by the retention cutoff: archived rows all precede live ones
+    samples = earlier['samples'] + later['samples']
+    return {
+        'bucket': earlier['bucket'],
+        'open': earlier['open'],
+        'high': max(earlier['high'], later['high']),
+        'low': min(earlier['low'], later['low']),
+        'close': later['close'],
+        'average': (earlier['average'] * earlier['samples'] + later['average'] * later['samples']) / samples,
+        'samples': samples,
+    }
+
+def price_history_ohlc(product_id, start, end, resolution, limit):
+    """The first ``limit`` OHLC buckets in [start, end) across archived and live rows."""
+    buckets = {}
+    # Rows inside the retention window are never archived, so recent ranges skip the archive
+    days = getattr(settings, 'PRICE_HISTORY_RETENTION_DAYS', 35)
+    cutoff = timezone.now() - timedelta(days=days)
+    if start < cutoff:
+        archived = archived_ohlc_buckets(product_id, start, min(end, cutoff), resolution, limit)
+        if len(archived) > limit:
+            return archived[:limit]
+        buckets = {row['bucket']: row for row in archived}
+    for row in ohlc_buckets(product_id, start, end, resolution)[:limit]:
+        earlier = buckets.get(row['bucket'])
+        buckets[row['bucket']] = merge_buckets(earlier, row) if earlier else row
+    return sorted(buckets.values(), key=lambda row: row['bucket'])[:limit]
@@ -0,0 +1,111 @@
+import struct
+import time
+from array import array
+from functools import lru_cache
+
+import redis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+DEFAULT_CAPACITY = 256
+
+# capacity, head, size
+_HEADER = struct.Struct('<III')
+
+
+class PriceTape:
+    """Fixed-size ring buffer of the most recent (timestamp, price) points for one product.
+
+    Packed as the header followed by ``capacity`` timestamps and ``capacity``
+    prices, all little-endian doubles. ``head`` is the next slot to overwrite.
+    """
+
+    def __init__(self, capacity, head, size, timestamps, prices):
+        self.capacity = capacity
+        self.head = head
+        self.size = size
+        self.timestamps = timestamps
+        self.prices = prices
+
+    def snapshot(self):
+        # Oldest point first
+        start = (self.head - self.size) % self.capacity
+        points = []
+        for offset in range(self.size):
+            index = (start + offset) % self.capacity
+            points.append([self.timestamps[index], self.prices[index]])
+        return points
+
+    @classmethod
+    def from_bytes(cls, data):
+        capacity, head, size = _HEADER.unpack_from(data)
+        offset = _HEADER.size
+        timestamps = array('d')
+        timestamps.frombytes(data[offset:offset + 8 * capacity])
+        prices = array('d')
+        prices.frombytes(data[offset + 8 * capacity:offset + 16 * capacity])
+        return cls(capacity, head, size, timestamps, prices)
+
+
+# Tapes live in Redis so the Celery workers that record prices and the web/ASGI
+# processes that serve them share one copy. Points are appended by a Lua script,
+# which Redis runs atomically, so concurrent pricing tasks never lose each other's
+# points and one call appends a whole batch. ARGV is the capacity for new tapes,
+# then a timestamp and price per key.
+APPEND_SCRIPT = """
+local header_size = 12
+for i, key in ipairs(KEYS) do
+    local capacity, head, size
+    local header = redis.call('GETRANGE', key, 0, header_size - 1)
+    if header == '' then
+        capacity, head, size = tonumber(ARGV[1]), 0, 0
+        redis.call('SET', key, struct.pack('<III', capacity, 0, 0) .. string.rep('\\0', 16 * capacity))
+    else
+        capacity, head, size = struct.unpack('<III', header)
+    end
+    redis.call('SETRANGE', key, header_size + 8 * head, struct.pack('<d', tonumber(ARGV[2 * i])))
+    redis.call('SETRANGE', key, header_size + 8 * (capacity + head), struct.pack('<d', tonumber(ARGV[2 * i + 1])))
+    redis.call('SETRANGE', key, 0, struct.pack('<III', capacity, (head + 1) % capacity, math.min(size + 1, capacity)))
+end
+return #KEYS
+"""
+
+
+@lru_cache(maxsize=None)
+def get_client():
+    return redis.Redis.from_url(getattr(settings, 'PRICE_TAPE_REDIS_URL', 'redis://localhost:6379'))
+
+
+@lru_cache(maxsize=None)
+def _append_script():
+    return get_client().register_script(APPEND_SCRIPT)
+
+
+def _key(product_id):
+    return f'price_tape:{product_id}'
+
+
+def record_prices(points, timestamp=None):
+    """Append (product_id, price) points to their tapes with one Redis round trip."""
+    points = list(points)
+    if not points:
+        return
+    timestamp = timestamp or time.time()
+    args = [getattr(settings, 'PRICE_TAPE_SIZE', DEFAULT_CAPACITY)]
+    for _, price in points:
+        args.extend((timestamp, float(price)))
+    _append_script()(keys=[_key(product_id) for product_id, _ in points], args=args)
+
+
+def record_price(product_id, price, timestamp=None):
+    record_prices([(product_id, price)], timestamp)
+
+
+def recent_prices(product_id):
+    data = get_client().get(_key(product_id))
+    return PriceTape.from_bytes(data).snapshot() if data is not None else []
+
+
+async def arecent_prices(product_id):
+    # redis-py's client is blocking, so it runs off the event loop like cache.aget
+    return await sync_to_async(recent_prices, thread_sensitive=False)(product_id)
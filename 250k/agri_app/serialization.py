@@ -0,0 +1,52 @@
+from array import array
+from decimal import Decimal, ROUND_HALF_UP
+
+import msgpack
+from kombu.serialization import register
+
+# Compact binary Celery serializer for high-volume price tasks: msgpack, with
+# Decimal carried as an extension type instead of JSON strings.
+PRICEPACK = 'pricepack'
+DECIMAL_EXT = 1
+
+
+def _default(obj):
+    if isinstance(obj, Decimal):
+        return msgpack.ExtType(DECIMAL_EXT, str(obj).encode())
+    raise TypeError(f'Cannot serialize {type(obj).__name__}')
+
+
+def _ext_hook(code, data):
+    if code == DECIMAL_EXT:
+        return Decimal(data.decode())
+    return msgpack.ExtType(code, data)
+
+
+def dumps(obj):
+    return msgpack.packb(obj, default=_default, use_bin_type=True)
+
+
+def loads(data):
+    return msgpack.unpackb(data, ext_hook=_ext_hook, raw=False)
+
+
+def register_pricepack():
+    register(PRICEPACK, dumps, loads, content_type='application/x-pricepack', content_encoding='binary')
+
+
+# Batched price updates travel as two packed int64 arrays: product ids and prices in cents
+
+def pack_price_updates(updates):
+    product_ids, prices_cents = array('q'), array('q')
+    for product_id, price in updates:
+        product_ids.append(product_id)
+        cents = (Decimal(str(price)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP)
+        prices_cents.append(int(cents))
+    return product_ids.tobytes(), prices_cents.tobytes()
+
+
+def unpack_price_updates(product_ids, prices_cents):
+    ids, cents = array('q'), array('q')
+    ids.frombytes(product_ids)
+    cents.frombytes(prices_cents)
+    return [(product_id, Decimal(price).scaleb(-2)) for product_id, price in zip(ids, cents)]
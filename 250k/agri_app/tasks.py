@@ -1,12 +1,32 @@
+import asyncio
 from celery import shared_task
-from .models import Product, PriceHistory
+from celery.signals import task_prerun
+from .models import Product, PriceHistory, DemandForecast
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+from datetime import timedelta
 from decimal import Decimal, ROUND_HALF_UP
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
+from dynamic_pricing.pricing import real_time_pricing_system
+from .db_routers import reset_pinning, stale_reads_allowed
+from .price_tape import record_price, record_prices
+from .archive import archive_price_history, archive_closed_orders
+from .serialization import PRICEPACK, pack_price_updates, unpack_price_updates
+
+@task_prerun.connect
+def unpin_primary(**kwargs):
+    # Worker threads are reused, so each task starts reading from the replicas again
+    reset_pinning()
 
 @shared_task
 def update_product_prices():
-    products = Product.objects.all()
+    # Pricing recompute tolerates replica lag, so keep its reads off the primary
+    with stale_reads_allowed():
+        products = list(Product.objects.all())
     for product in products:
         new_price = calculate_dynamic_price(product.id)
         try:
@@ -21,16 +41,21 @@ def predict_demand(product_name):
     # For now, we'll return a dummy value
     return 100.0
 
+def predict_demand_batch(product_names):
+    # Batch entry point into the forecasting engine used by the refresh pipeline
+    return [predict_demand(name) for name in product_names]
+
 def calculate_dynamic_price(product_id, current_supply, predicted_demand):
     # Implement your dynamic pricing logic here
     # For now, we'll return a dummy value
     return Decimal('10.00').quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
 
-@shared_task
+@shared_task(serializer=PRICEPACK)
 def update_product_price(product_id, new_price):
     product = Product.objects.get(id=product_id)
     product.price = new_price
     product.save()
+    record_price(product_id, new_price)
 
     # Notify WebSocket clients
     channel_layer = get_channel_layer()
@@ -42,3 +67,150 @@ def update_product_price(product_id, new_price):
             "new_price": str(new_price)
         }
     )
+
+PRICE_BATCH_SIZE = 1000
+
+@shared_task(serializer=PRICEPACK)
+def update_product_prices_batch(product_ids, prices_cents):
+    # Many price updates per message, applied with one bulk write
+    new_prices = dict(unpack_price_updates(product_ids, prices_cents))
+    products = list(Product.objects.filter(id__in=new_prices))
+    for product in products:
+        product.price = new_prices[product.id]
+    Product.objects.bulk_update(products, ['price'])
+    # One Redis call appends the whole batch to the price tapes
+    record_prices((product.id, product.price) for product in products)
+    async_to_sync(broadcast_prices)(products)
+
+# Group sends in flight at once; each holds a channel layer Redis connection
+BROADCAST_CONCURRENCY = 10
+
+async def broadcast_prices(products):
+    # Notify WebSocket clients from one event loop, a few group sends at a time
+    channel_layer = get_channel_layer()
+    semaphore = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+
+    async def send(product):
+        async with semaphore:
+            await channel_layer.group_send(
+                f"product_{product.id}",
+                {
+                    "type": "price_update",
+                    "product_id": product.id,
+                    "new_price": str(product.price)
+                }
+            )
+
+    await asyncio.gather(*(send(product) for product in products))
+
+def enqueue_price_updates(updates, batch_size=PRICE_BATCH_SIZE):
+    # updates is a list of (product_id, price) pairs; returns the number of messages sent
+    messages = 0
+    for index in range(0, len(updates), batch_size):
+        update_product_prices_batch.delay(*pack_price_updates(updates[index:index + batch_size]))
+        messages += 1
+    return messages
+
+@shared_task
+def reprice_product(product_id):
+    # Run the pricing model in the worker so web requests never block on it
+    product = Product.objects.get(id=product_id)
+    new_price = real_time_pricing_system(product.name)
+    update_product_price(product_id, new_price)
+
+@shared_task
+def reprice_products(product_ids):
+    for product_id in product_ids:
+        try:
+            reprice_product(product_id)
+        except Exception as e:
+            print(f"Error repricing product {product_id}: {e}")
+
+# Uploaded dumps are ingested here and the web process polls the job record
+INGEST_JOB_TIMEOUT = 60 * 60 * 24
+
+def ingest_job_key(job_id):
+    return f'ingest_job_{job_id}'
+
+@shared_task
+def ingest_listings_file(job_id, path, file_format, start_line=0, supplier_id=None):
+    # Imported here because ingestion imports reprice_products from this module
+    from .ingestion import ingest_listings
+
+    key = ingest_job_key(job_id)
+    job = cache.get(key) or {}
+
+    def progress(stats):
+        cache.set(key, {**job, 'status': 'running', 'stats': stats}, timeout=INGEST_JOB_TIMEOUT)
+
+    try:
+        with default_storage.open(path, 'rb') as stream:
+            stats = ingest_listings(stream, file_format, start_line=start_line, supplier_id=supplier_id, progress=progress)
+    finally:
+        default_storage.delete(path)
+    status = 'stopped' if 'stopped_at' in stats else 'done'
+    cache.set(key, {**job, 'status': status, 'stats': stats}, timeout=INGEST_JOB_TIMEOUT)
+    return status
+
+FORECAST_BATCH_SIZE = 500
+# Forecasts are refreshed daily, so a cached value is good until the next refresh
+FORECAST_CACHE_TIMEOUT = 60 * 60 * 24
+
+def upsert_forecasts(forecasts):
+    if connection.features.supports_update_conflicts_with_target:
+        DemandForecast.objects.bulk_create(
+            forecasts,
+            update_conflicts=True,
+            unique_fields=['product'],
+            update_fields=['predicted_demand', 'last_updated'],
+        )
+        return
+
+    # Backends without ON CONFLICT: update the forecasts that exist, insert the rest
+    existing = dict(
+        DemandForecast.objects.filter(
+            product_id__in=[forecast.product_id for forecast in forecasts]
+        ).values_list('product_id', 'id')
+    )
+    to_update, to_create = [], []
+    for forecast in forecasts:
+        forecast.id = existing.get(forecast.product_id)
+        (to_update if forecast.id else to_create).append(forecast)
+    DemandForecast.objects.bulk_update(to_update, ['predicted_demand', 'last_updated'])
+    DemandForecast.objects.bulk_create(to_create)
+
+@shared_task
+def refresh_demand_forecasts(batch_size=FORECAST_BATCH_SIZE):
+    # One query finds every product whose forecast is missing or outdated
+    cutoff = timezone.now() - timedelta(days=1)
+    stale = list(
+        Product.objects.filter(
+            Q(demandforecast__isnull=True) | Q(demandforecast__last_updated__lte=cutoff)
+        ).values_list('id', 'name')
+    )
+
+    for index in range(0, len(stale), batch_size):
+        batch = stale[index:index + batch_size]
+        demands = predict_demand_batch([name for _, name in batch])
+
+        now = timezone.now()
+        upsert_forecasts([
+            DemandForecast(product_id=product_id, predicted_demand=demand, last_updated=now)
+            for (product_id, _), demand in zip(batch, demands)
+        ])
+
+        # Warm the cache read by the pricing endpoint (a Redis cache shared with the web processes)
+        cache.set_many(
+            {f'predicted_demand_{product_id}': demand for (product_id, _), demand in zip(batch, demands)},
+            timeout=FORECAST_CACHE_TIMEOUT,
+        )
+
+    return len(stale)
+
+@shared_task
+def archive_cold_data():
+    # Keep the live PriceHistory and Order tables down to the hot rows pricing reads
+    return {
+        'price_history': archive_price_history(),
+        'orders': archive_closed_orders(),
+    }
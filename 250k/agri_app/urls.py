@@ -1,6 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ProductViewSet, update_product_price, update_price, get_product
+from .views import (
+    ProductViewSet, update_product_price, update_price, get_product,
+    get_product_async, update_price_async, get_dynamic_price_async, get_recent_prices,
+    get_price_history, ingest_supplier_listings, get_ingest_job,
+)
 
 router = DefaultRouter()
 router.register(r'products', ProductViewSet)
@@ -10,4 +14,11 @@ urlpatterns = [
     path('update-product-price/', update_product_price, name='update_product_price'),
     path('update-price/<int:product_id>/', update_price, name='update_price'),
     path('get-product/<int:product_id>/', get_product, name='get_product'),
+    path('async/get-product/<int:product_id>/', get_product_async, name='get_product_async'),
+    path('async/update-price/<int:product_id>/', update_price_async, name='update_price_async'),
+    path('async/dynamic-price/<int:product_id>/', get_dynamic_price_async, name='get_dynamic_price_async'),
+    path('recent-prices/<int:product_id>/', get_recent_prices, name='get_recent_prices'),
+    path('price-history/<int:product_id>/', get_price_history, name='get_price_history'),
+    path('ingest-listings/', ingest_supplier_listings, name='ingest_supplier_listings'),
+    path('ingest-listings/<str:job_id>/', get_ingest_job, name='get_ingest_job'),
 ]
@@ -5,11 +5,25 @@ from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from datetime import timedelta
+from decimal import Decimal
+from asgiref.sync import sync_to_async
 import json
-from .models import Product, DemandForecast
+import os
+import uuid
+from .models import Product, DemandForecast, Supplier
 from .serializers import ProductSerializer
-from .tasks import predict_demand, calculate_dynamic_price
-from dynamic_pricing.pricing import real_time_pricing_system
+from .tasks import (
+    calculate_dynamic_price, reprice_product, ingest_listings_file, ingest_job_key,
+    FORECAST_CACHE_TIMEOUT, INGEST_JOB_TIMEOUT,
+)
+from .price_tape import arecent_prices
+from .price_history import RESOLUTIONS, price_history_ohlc
+from .ingestion import FORMATS
 
 class ProductViewSet(viewsets.ModelViewSet):
     queryset = Product.objects.all()
@@ -27,12 +41,54 @@ class ProductViewSet(viewsets.ModelViewSet):
 @csrf_exempt
 @require_http_methods(["POST"])
 def update_product_price(request):
-    # ... copy the update_product_price function from your original file ...
+    try:
+        data = json.loads(request.body)
+        product_id = data.get('product_id')
+        current_supply = data.get('current_supply')
+
+        if not product_id or current_supply is None:
+            return JsonResponse({'error': 'Missing required parameters'}, status=400)
+
+        product = Product.objects.get(id=product_id)
+
+        # Try to get the predicted demand from cache
+        cache_key = f'predicted_demand_{product_id}'
+        predicted_demand = cache.get(cache_key)
+
+        if predicted_demand is None:
+            # Forecasts are computed by the refresh_demand_forecasts task, never inline here
+            predicted_demand = DemandForecast.objects.filter(product=product).values_list(
+                'predicted_demand', flat=True
+            ).first()
+            if predicted_demand is None:
+                return JsonResponse({'error': 'Demand forecast not available yet'}, status=503)
+            cache.set(cache_key, predicted_demand, timeout=FORECAST_CACHE_TIMEOUT)
+
+        # Calculate the dynamic price based on the pricing model
+        new_price = calculate_dynamic_price(product_id, current_supply, predicted_demand)
+
+        # Update the product price in the database
+        product.price = new_price
+        product.save()
+
+        # Return the updated price to the frontend
+        return JsonResponse({
+            'product_id': product_id,
+            'new_price': new_price,
+            'predicted_demand': predicted_demand
+        })
+
+    except Product.DoesNotExist:
+        return JsonResponse({'error': 'Product not found'}, status=404)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
 
 def update_price(request, product_id):
-    product = Product.objects.get(id=product_id)
-    new_price = real_time_pricing_system(product.name)
-    update_product_price.delay(product_id, new_price)
+    if not Product.objects.filter(id=product_id).exists():
+        return JsonResponse({'error': 'Product not found'}, status=404)
+
+    # Pricing runs in the Celery worker, the same work as update_price_async
+    reprice_product.delay(product_id)
     return JsonResponse({'status': 'Price update scheduled'})
 
 def get_product(request, product_id):
@@ -44,3 +100,136 @@ def get_product(request, product_id):
         'quantity': product.quantity,
         'seller': product.seller.username
     })
+
+# Async-native views for the ASGI server. These run on the event loop instead of
+# hopping through the thread-sensitive executor used by the sync views above.
+
+async def get_product_async(request, product_id):
+    try:
+        product = await Product.objects.select_related('seller').aget(id=product_id)
+    except Product.DoesNotExist:
+        return JsonResponse({'error': 'Product not found'}, status=404)
+    return JsonResponse({
+        'id': product.id,
+        'name': product.name,
+        'price': str(product.price),
+        'quantity': product.quantity,
+        'seller': product.seller.username
+    })
+
+async def update_price_async(request, product_id):
+    if not await Product.objects.filter(id=product_id).aexists():
+        return JsonResponse({'error': 'Product not found'}, status=404)
+
+    # Pricing runs in the Celery worker; only the broker publish leaves the event loop
+    await sync_to_async(reprice_product.delay, thread_sensitive=False)(product_id)
+    return JsonResponse({'status': 'Price update scheduled'})
+
+async def get_dynamic_price_async(request, product_id):
+    if not await Product.objects.filter(id=product_id).aexists():
+        return JsonResponse({'error': 'Product not found'}, status=404)
+    try:
+        price = calculate_dynamic_price(product_id, 100, 100)  # Dummy values for supply and demand
+        return JsonResponse({'price': price})
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+async def get_recent_prices(request, product_id):
+    # Served from the in-cache price tape; never touches the database
+    return JsonResponse({
+        'product_id': product_id,
+        'prices': await arecent_prices(product_id)
+    })
+
+PRICE_HISTORY_PAGE_SIZE = 500
+
+def parse_query_datetime(value):
+    # Naive values are read in the current timezone so they compare with the aware cursor
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f'Invalid datetime: {value!r}')
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+def get_price_history(request, product_id):
+    resolution = request.GET.get('resolution', 'day')
+    if resolution not in RESOLUTIONS:
+        return JsonResponse({'error': f"Invalid resolution. Choose one of: {', '.join(RESOLUTIONS)}"}, status=400)
+
+    try:
+        end = parse_query_datetime(request.GET['end']) if 'end' in request.GET else timezone.now()
+        start = parse_query_datetime(request.GET['start']) if 'start' in request.GET else end - timedelta(days=30)
+        # The cursor is the start of the first bucket not yet returned
+        cursor = parse_query_datetime(request.GET['cursor']) if 'cursor' in request.GET else None
+        limit = min(int(request.GET.get('limit', PRICE_HISTORY_PAGE_SIZE)), PRICE_HISTORY_PAGE_SIZE)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if limit < 1:
+        return JsonResponse({'error': 'Invalid limit'}, status=400)
+    if cursor is not None:
+        start = max(start, cursor)
+
+    # Spans live rows and the monthly archive, so ranges past the retention window still chart
+    rows = price_history_ohlc(product_id, start, end, resolution, limit + 1)
+    next_cursor = rows.pop()['bucket'].isoformat() if len(rows) > limit else None
+    cent = Decimal('0.01')
+
+    return JsonResponse({
+        'product_id': product_id,
+        'resolution': resolution,
+        'buckets': [{
+            'time': row['bucket'].isoformat(),
+            'open': str(row['open'].quantize(cent)),
+            'high': str(row['high'].quantize(cent)),
+            'low': str(row['low'].quantize(cent)),
+            'close': str(row['close'].quantize(cent)),
+            'average': str(row['average'].quantize(cent)),
+            'samples': row['samples'],
+        } for row in rows],
+        'next': next_cursor
+    })
+
+@require_http_methods(["POST"])
+def ingest_supplier_listings(request):
+    # Staff may load any supplier's dump; a supplier only their own listings
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    supplier_id = None
+    if not request.user.is_staff:
+        supplier_id = Supplier.objects.filter(user=request.user).values_list('id', flat=True).first()
+        if supplier_id is None:
+            return JsonResponse({'error': 'Only staff or supplier accounts can ingest listings'}, status=403)
+
+    upload = request.FILES.get('file')
+    if upload is None:
+        return JsonResponse({'error': 'Missing file'}, status=400)
+
+    file_format = request.POST.get('format') or ('ndjson' if upload.name.endswith(('.ndjson', '.jsonl')) else 'csv')
+    if file_format not in FORMATS:
+        return JsonResponse({'error': "Invalid format. Choose 'csv' or 'ndjson'."}, status=400)
+    try:
+        start_line = int(request.POST.get('start_line', 0))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid start_line'}, status=400)
+
+    # Dumps run to hundreds of thousands of rows, so they are ingested by a worker
+    # from storage and the client polls the job instead of holding the request open
+    job_id = uuid.uuid4().hex
+    path = default_storage.save(f'ingest/{job_id}{os.path.splitext(upload.name)[1]}', upload)
+    cache.set(ingest_job_key(job_id), {'status': 'queued', 'user_id': request.user.id}, timeout=INGEST_JOB_TIMEOUT)
+    ingest_listings_file.delay(job_id, path, file_format, start_line, supplier_id)
+    return JsonResponse({
+        'job_id': job_id,
+        'status_url': reverse('get_ingest_job', args=[job_id]),
+    }, status=202)
+
+def get_ingest_job(request, job_id):
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    job = cache.get(ingest_job_key(job_id))
+    if job is None or (not request.user.is_staff and job['user_id'] != request.user.id):
+        return JsonResponse({'error': 'Job not found'}, status=404)
+    return JsonResponse({
+        'job_id': job_id,
+        'status': job['status'],
+        'stats': job.get('stats'),
+    })
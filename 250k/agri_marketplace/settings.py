@@ -10,6 +10,52 @@ INSTALLED_APPS = [
 CELERY_BROKER_URL = 'redis://localhost:6379'
 CELERY_RESULT_BACKEND = 'redis://localhost:6379'
 
+# High-volume task profile. Results are only stored when a caller asks for them
+# with apply_async(..., ignore_result=False) or a task sets ignore_result=False.
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_ACCEPT_CONTENT = ['json', 'pricepack']
+CELERY_TASK_ROUTES = {
+    'agri_app.tasks.update_product_price': {'queue': 'pricing'},
+    'agri_app.tasks.update_product_prices_batch': {'queue': 'pricing'},
+    'agri_app.tasks.reprice_product': {'queue': 'pricing'},
+    # reprice_products runs the model for up to 1000 products, so it stays on the
+    # default queue with the other long jobs
+}
+# Prefetch is set per worker, so the Procfile runs one worker per queue: the
+# pricing worker prefetches deeply, since its tasks are short and numerous. This
+# default suits the default queue's long batch jobs (forecast refresh, archival,
+# reprice_products), which should not be hoarded by one worker.
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
+# Refresh outdated demand forecasts ahead of the pricing endpoint
+CELERY_BEAT_SCHEDULE = {
+    'refresh-demand-forecasts': {
+        'task': 'agri_app.tasks.refresh_demand_forecasts',
+        'schedule': 60 * 60,  # Hourly; only forecasts older than a day are recomputed
+    },
+    'archive-cold-data': {
+        'task': 'agri_app.tasks.archive_cold_data',
+        'schedule': 60 * 60 * 24,
+    },
+}
+
+# Data lifecycle: older rows move to monthly compressed files under ARCHIVE_ROOT
+ARCHIVE_ROOT = 'archive'
+PRICE_HISTORY_RETENTION_DAYS = 35  # Pricing averages over the last 30 days
+ORDER_RETENTION_DAYS = 30
+ARCHIVED_ORDER_STATUSES = ['Completed', 'Cancelled']
+
+# Shared by the web processes and the Celery workers (price tape, demand forecasts),
+# so it must not be a per-process cache
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://localhost:6379',
+    }
+}
+# Recent-price tapes are appended in place by a Lua script, so they use a plain Redis client
+PRICE_TAPE_REDIS_URL = 'redis://localhost:6379'
+
 # Add WebSocket settings
 CHANNEL_LAYERS = {
     'default': {
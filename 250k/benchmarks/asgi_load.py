@@ -0,0 +1,78 @@
+"""Load comparison of the sync and async product views on the same ASGI server.
+
+Start the server first, e.g.:
+    uvicorn agri_marketplace.asgi:application --workers 1
+
+Then run:
+    python benchmarks/asgi_load.py --product-id 1 --requests 2000 --concurrency 100
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+ENDPOINTS = {
+    'get_product': ('GET', 'get-product/{id}/', 'async/get-product/{id}/'),
+    'update_price': ('POST', 'update-price/{id}/', 'async/update-price/{id}/'),
+    'dynamic_price': ('GET', 'products/{id}/get_dynamic_price/', 'async/dynamic-price/{id}/'),
+}
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_load(client, method, url, total, concurrency):
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.request(method, url)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        'throughput': total / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'errors': errors,
+    }
+
+
+async def main(args):
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=30) as client:
+        for name, (method, sync_path, async_path) in ENDPOINTS.items():
+            for label, path in (('sync', sync_path), ('async', async_path)):
+                url = path.format(id=args.product_id)
+                # Warm up connections and caches before measuring
+                await run_load(client, method, url, args.concurrency, args.concurrency)
+                result = await run_load(client, method, url, args.requests, args.concurrency)
+                print(
+                    f"{name:<14} {label:<5} "
+                    f"{result['throughput']:>8.1f} req/s  "
+                    f"p50 {result['p50_ms']:>7.1f} ms  "
+                    f"p99 {result['p99_ms']:>7.1f} ms  "
+                    f"errors {result['errors']}"
+                )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://localhost:8000/api/')
+    parser.add_argument('--product-id', type=int, default=1)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=100)
+    asyncio.run(main(parser.parse_args()))
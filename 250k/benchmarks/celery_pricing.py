@@ -0,0 +1,132 @@
+"""Broker round-trips and Redis memory per 100k price updates, before and after
+the high-volume task profile.
+
+before: one update_product_price message per update, JSON, result stored
+after:  update_product_prices_batch messages of 1000 packed updates, pricepack,
+        results ignored
+
+Messages go to a scratch queue with no consumer. Results are written directly
+with the result backend, the same way a worker would store them. --execute also
+runs the task bodies in this process, as a worker would, and counts the Redis
+commands they issue (price tapes and WebSocket group sends). That needs the
+database configured with products 1-5000. Needs the Redis from
+agri_marketplace/settings.py:
+
+    python benchmarks/celery_pricing.py --updates 100000 --execute
+"""
+import argparse
+import os
+import sys
+from decimal import Decimal
+
+import django
+import redis
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'agri_marketplace.settings')
+
+from agri_marketplace.celery import app  # noqa: E402
+from agri_app.serialization import PRICEPACK, pack_price_updates  # noqa: E402
+
+QUEUE = 'bench_pricing'
+
+
+def redis_stats(client):
+    info = client.info()
+    calls = {name[len('cmdstat_'):]: stats['calls'] for name, stats in client.info('commandstats').items()}
+    return info['used_memory'], info['total_commands_processed'], calls
+
+
+def report(label, count_label, count, before, after, memory=True):
+    memory_before, commands_before, calls_before = before
+    memory_after, commands_after, calls_after = after
+    # Commands run inside a Lua script are counted too, so the breakdown shows
+    # which ones crossed the network (evalsha) and which ran inside the script
+    calls = {name: total - calls_before.get(name, 0) for name, total in calls_after.items()}
+    breakdown = sorted((item for item in calls.items() if item[1] > 0), key=lambda item: -item[1])
+    line = f"{label:<16} {count_label} {count:>7}  redis commands {commands_after - commands_before:>8}"
+    if memory:
+        line += f"  memory {(memory_after - memory_before) / 1024 / 1024:>8.2f} MiB"
+    print(f"{line}\n    {', '.join(f'{name} {total}' for name, total in breakdown)}")
+
+
+def cleanup(client, task_ids):
+    client.delete(QUEUE)
+    for index in range(0, len(task_ids), 10000):
+        client.delete(*(f'celery-task-meta-{task_id}' for task_id in task_ids[index:index + 10000]))
+
+
+def run_before(updates):
+    task_ids = []
+    for product_id, price in updates:
+        result = app.send_task(
+            'agri_app.tasks.update_product_price', args=(product_id, price),
+            queue=QUEUE, serializer='json', ignore_result=False,
+        )
+        task_ids.append(result.id)
+        # What the worker writes back for a task whose result is not ignored
+        app.backend.store_result(result.id, None, 'SUCCESS')
+    return len(updates), task_ids
+
+
+def run_after(updates, batch_size):
+    messages = 0
+    for index in range(0, len(updates), batch_size):
+        app.send_task(
+            'agri_app.tasks.update_product_prices_batch',
+            args=pack_price_updates(updates[index:index + batch_size]),
+            queue=QUEUE, serializer=PRICEPACK, ignore_result=True,
+        )
+        messages += 1
+    return messages, []
+
+
+def execute_before(updates):
+    from agri_app.tasks import update_product_price
+    for product_id, price in updates:
+        update_product_price(product_id, price)
+    return len(updates)
+
+
+def execute_after(updates, batch_size):
+    from agri_app.tasks import update_product_prices_batch
+    tasks = 0
+    for index in range(0, len(updates), batch_size):
+        update_product_prices_batch(*pack_price_updates(updates[index:index + batch_size]))
+        tasks += 1
+    return tasks
+
+
+def measure(client, label, run):
+    client.delete(QUEUE)
+    before = redis_stats(client)
+    messages, task_ids = run()
+    after = redis_stats(client)
+    cleanup(client, task_ids)
+    report(f'{label} publish', 'messages', messages, before, after)
+
+
+def measure_worker(client, label, run):
+    # Worker-side memory is the price tapes, which are the same either way
+    before = redis_stats(client)
+    tasks = run()
+    report(f'{label} worker', 'tasks   ', tasks, before, redis_stats(client), memory=False)
+
+
+def main(args):
+    client = redis.Redis.from_url(app.conf.broker_url)
+    updates = [(product_id % 5000 + 1, Decimal('12.34') + product_id % 100) for product_id in range(args.updates)]
+    measure(client, 'before', lambda: run_before(updates))
+    measure(client, 'after', lambda: run_after(updates, args.batch_size))
+    if args.execute:
+        django.setup()
+        measure_worker(client, 'before', lambda: execute_before(updates))
+        measure_worker(client, 'after', lambda: execute_after(updates, args.batch_size))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--updates', type=int, default=100000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--execute', action='store_true', help='Also run the task bodies and count worker-side Redis commands')
+    main(parser.parse_args())
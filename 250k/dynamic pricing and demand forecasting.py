@@ -7,6 +7,15 @@ from prophet import Prophet
 from sklearn.linear_model import LinearRegression
 from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import train_test_split
+import os
+import django
+from celery import shared_task
+
+# Prices are persisted through the marketplace's models and Celery tasks
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'agri_marketplace.settings')
+django.setup()
+from agri_app.models import Product
+from agri_app.tasks import enqueue_price_updates
 
 # Function to fetch and process historical sales data
 def get_historical_sales_data():
@@ -39,6 +48,14 @@ def get_supply_data():
     df['date'] = pd.to_datetime(df['date'])
     return df
 
+# Season for each month, for vectorized lookups over a date column
+SEASONS_BY_MONTH = {
+    3: 'Spring', 4: 'Spring', 5: 'Spring',
+    6: 'Summer', 7: 'Summer', 8: 'Summer',
+    9: 'Autumn', 10: 'Autumn', 11: 'Autumn',
+    12: 'Winter', 1: 'Winter', 2: 'Winter',
+}
+
 # Function to determine season based on date
 def get_season(date):
     month = date.month
@@ -87,17 +104,198 @@ def create_agriculture_platform():
     merged_data = merged_data.merge(economic_data, on='date')
 
     # Add season information
-    merged_data['season'] = merged_data['date'].apply(get_season)
+    merged_data['season'] = merged_data['date'].dt.month.map(SEASONS_BY_MONTH)
 
     # Calculate some basic metrics
+    # Price-change statistics live in the feature store instead of being recomputed here
     merged_data['supply_demand_ratio'] = merged_data['quantity_supplied'] / merged_data['quantity_demanded']
-    merged_data['price_change'] = merged_data.groupby('product_name')['price'].pct_change()
 
     return merged_data
 
+# Precomputed per-product features, materialized once and refreshed incrementally
+# as new dates arrive, so pricing does O(1) lookups instead of scanning history
+class FeatureStore:
+    def __init__(self, window=7):
+        self.window = window
+        self.products = []
+        self.index = {}
+        # Per product: the last date folded in and how many rows up to it
+        self.last_date = np.array([], dtype='datetime64[ns]')
+        self.row_count = np.zeros(0, dtype=int)
+        # Per product and month: sum and count of prices, for seasonal factors
+        self.month_price_sum = np.zeros((0, 12))
+        self.month_price_count = np.zeros((0, 12))
+        # Last `window` supply/demand ratios per product, oldest first (NaN padded)
+        self.ratio_window = np.zeros((0, window))
+        # Running count, mean and M2 of price changes, plus the last price seen
+        self.change_count = np.zeros(0)
+        self.change_mean = np.zeros(0)
+        self.change_m2 = np.zeros(0)
+        self.last_price = np.zeros(0)
+        self.seasonal_table = np.ones((0, 12))
+
+    def _add_products(self, names):
+        new = [name for name in names if name not in self.index]
+        if not new:
+            return
+        for name in new:
+            self.index[name] = len(self.products)
+            self.products.append(name)
+        n = len(new)
+        self.last_date = np.concatenate([self.last_date, np.full(n, np.datetime64('NaT'), dtype='datetime64[ns]')])
+        self.row_count = np.concatenate([self.row_count, np.zeros(n, dtype=int)])
+        self.month_price_sum = np.vstack([self.month_price_sum, np.zeros((n, 12))])
+        self.month_price_count = np.vstack([self.month_price_count, np.zeros((n, 12))])
+        self.ratio_window = np.vstack([self.ratio_window, np.full((n, self.window), np.nan)])
+        self.change_count = np.concatenate([self.change_count, np.zeros(n)])
+        self.change_mean = np.concatenate([self.change_mean, np.zeros(n)])
+        self.change_m2 = np.concatenate([self.change_m2, np.zeros(n)])
+        self.last_price = np.concatenate([self.last_price, np.full(n, np.nan)])
+
+    def _reset_products(self, rows):
+        self.last_date[rows] = np.datetime64('NaT')
+        self.row_count[rows] = 0
+        self.month_price_sum[rows] = 0
+        self.month_price_count[rows] = 0
+        self.ratio_window[rows] = np.nan
+        self.change_count[rows] = 0
+        self.change_mean[rows] = 0
+        self.change_m2[rows] = 0
+        self.last_price[rows] = np.nan
+
+    def update(self, data):
+        """Fold the platform history ``data`` into the store.
+
+        Each product continues from its own last date, so a new product is
+        built from its whole history. A product whose rows up to that date no
+        longer match what was folded in, e.g. late rows for a date already seen,
+        is rebuilt from ``data``.
+        """
+        if data.empty:
+            return self
+        data = data.sort_values('date', kind='stable')
+        self._add_products(data['product_name'].unique())
+        rows = data['product_name'].map(self.index).to_numpy()
+        seen = data['date'].to_numpy() <= self.last_date[rows]  # False for NaT
+
+        stale = np.flatnonzero(np.bincount(rows[seen], minlength=len(self.products)) != self.row_count)
+        if len(stale):
+            self._reset_products(stale)
+            seen &= ~np.isin(rows, stale)
+        self._fold(data[~seen])
+        self._build_seasonal_table()
+        return self
+
+    def _fold(self, data):
+        # data holds rows after each product's last date, sorted by date
+        rows = data['product_name'].map(self.index).to_numpy()
+
+        # Seasonal sums and counts per product and month
+        months = data['date'].dt.month.to_numpy() - 1
+        np.add.at(self.month_price_sum, (rows, months), data['price'].to_numpy(dtype=float))
+        np.add.at(self.month_price_count, (rows, months), 1)
+
+        ratios = (data['quantity_supplied'] / data['quantity_demanded']).to_numpy(dtype=float)
+        for name, positions in data.groupby('product_name').indices.items():
+            row = self.index[name]
+
+            # Rolling supply/demand ratio window
+            recent = np.concatenate([self.ratio_window[row], ratios[positions]])
+            self.ratio_window[row] = recent[-self.window:]
+
+            # Price changes continue from the last stored price, merged with Chan's method
+            prices = np.concatenate([[self.last_price[row]], data['price'].to_numpy(dtype=float)[positions]])
+            changes = prices[1:] / prices[:-1] - 1
+            changes = changes[np.isfinite(changes)]
+            self.last_price[row] = prices[-1]
+            if len(changes):
+                count, mean = len(changes), changes.mean()
+                m2 = ((changes - mean) ** 2).sum()
+                total = self.change_count[row] + count
+                delta = mean - self.change_mean[row]
+                self.change_m2[row] += m2 + delta ** 2 * self.change_count[row] * count / total
+                self.change_mean[row] += delta * count / total
+                self.change_count[row] = total
+
+            self.last_date[row] = data['date'].iloc[positions[-1]]
+            self.row_count[row] += len(positions)
+
+    def _build_seasonal_table(self):
+        # Average price per month relative to the product's overall average; 1.0 where unknown
+        with np.errstate(divide='ignore', invalid='ignore'):
+            month_mean = self.month_price_sum / self.month_price_count
+            overall_mean = self.month_price_sum.sum(axis=1) / self.month_price_count.sum(axis=1)
+            table = month_mean / overall_mean[:, None]
+        self.seasonal_table = np.where(np.isfinite(table), table, 1.0)
+
+    def seasonal_factors(self, product_names, month):
+        rows = np.array([self.index.get(name, -1) for name in product_names], dtype=int)
+        factors = np.ones(len(rows))
+        known = rows >= 0
+        factors[known] = self.seasonal_table[rows[known], month - 1]
+        return factors
+
+    def seasonal_factor(self, product_name, month):
+        row = self.index.get(product_name)
+        return 1.0 if row is None else self.seasonal_table[row, month - 1]
+
+    def supply_demand_ratio(self, product_name):
+        row = self.index.get(product_name)
+        return np.nan if row is None else np.nanmean(self.ratio_window[row])
+
+    def price_change_stats(self, product_name):
+        row = self.index.get(product_name)
+        if row is None or not self.change_count[row]:
+            return {'count': 0, 'mean': np.nan, 'std': np.nan}
+        count = self.change_count[row]
+        std = np.sqrt(self.change_m2[row] / (count - 1)) if count > 1 else np.nan
+        return {'count': int(count), 'mean': self.change_mean[row], 'std': std}
+
+    def save(self, path):
+        np.savez_compressed(
+            path,
+            products=np.array(self.products),
+            window=self.window,
+            last_date=self.last_date,
+            row_count=self.row_count,
+            month_price_sum=self.month_price_sum,
+            month_price_count=self.month_price_count,
+            ratio_window=self.ratio_window,
+            change_count=self.change_count,
+            change_mean=self.change_mean,
+            change_m2=self.change_m2,
+            last_price=self.last_price,
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            store = cls(window=int(data['window']))
+            store.products = data['products'].tolist()
+            store.index = {name: row for row, name in enumerate(store.products)}
+            for field in ('last_date', 'row_count', 'month_price_sum', 'month_price_count', 'ratio_window',
+                          'change_count', 'change_mean', 'change_m2', 'last_price'):
+                setattr(store, field, data[field])
+        store._build_seasonal_table()
+        return store
+
+FEATURE_STORE_PATH = 'feature_store.npz'
+
+# Load the materialized features and fold in any new dates, or build them on first run
+def refresh_feature_store(agriculture_platform, path=FEATURE_STORE_PATH):
+    try:
+        store = FeatureStore.load(path)
+    except (FileNotFoundError, KeyError):
+        # KeyError: saved before per-product dates were tracked, so rebuild it
+        store = FeatureStore()
+    store.update(agriculture_platform)
+    store.save(path)
+    return store
+
 # Create the platform
 
 agriculture_platform = create_agriculture_platform()
+feature_store = refresh_feature_store(agriculture_platform)
 
 # Print some sample data
 print(agriculture_platform.head())
@@ -179,26 +377,26 @@ def dynamic_pricing(agriculture_platform, product_name):
     model.fit(X_train_scaled, y_train)
 
     # Function to predict price
+    # Accepts scalars for one product or aligned arrays to price a whole catalogue in one call
     def predict_price(supply, demand, month):
+        scalar_input = np.ndim(supply) == 0 and np.ndim(demand) == 0
+        supply, demand, month = np.broadcast_arrays(np.atleast_1d(supply), np.atleast_1d(demand), np.atleast_1d(month))
+
         # Create a DataFrame with the input
-        input_data = pd.DataFrame([[supply, demand, month]], columns=['supply', 'demand', 'month'])
-        
+        input_data = pd.DataFrame({'supply': supply, 'demand': demand, 'month': month})
+
         # One-hot encode the month
         input_data = pd.get_dummies(input_data, columns=['month'], prefix='month')
-        
-        # Ensure all columns from training are present
-        for col in X.columns:
-            if col not in input_data.columns:
-                input_data[col] = 0
 
-        # Reorder columns to match training data
-        input_data = input_data[X.columns]
+        # Ensure all columns from training are present, in training order
+        input_data = input_data.reindex(columns=X.columns, fill_value=0)
 
         # Scale the input
         input_scaled = scaler.transform(input_data)
 
-        # Predict and return the price
-        return model.predict(input_scaled)[0]
+        # Predict and return the price(s)
+        prices = model.predict(input_scaled)
+        return prices[0] if scalar_input else prices
 
     return predict_price
 
@@ -217,16 +415,43 @@ print(f"The optimal price for {product_name} is: ${optimal_price:.2f}")
 
 # You can now use this function to dynamically adjust prices based on current supply, demand, and seasonality
 
-def real_time_pricing_system(agriculture_platform, product_name, predict_price):
+# Latest supply and demand per product, aligned to product_names (NaN if unknown)
+def get_current_supply_and_demand(agriculture_platform, product_names):
+    latest = (
+        agriculture_platform.sort_values('date')
+        .groupby('product_name')[['quantity_supplied', 'quantity_demanded']]
+        .last()
+        .reindex(product_names)
+    )
+    return latest['quantity_supplied'].to_numpy(dtype=float), latest['quantity_demanded'].to_numpy(dtype=float)
+
+# Next forecasted demand per product from predict_future_demand output (NaN if unknown)
+def get_demand_forecasts(demand_forecast, product_names):
+    return np.array([
+        demand_forecast[name]['yhat'].iloc[0] if name in demand_forecast else np.nan
+        for name in product_names
+    ])
+
+# Both pricing functions write through this one bulk path: batched price-update messages
+def persist_prices(product_names, prices):
+    product_ids = dict(Product.objects.filter(name__in=list(product_names)).values_list('name', 'id'))
+    updates = [
+        (product_ids[name], float(price))
+        for name, price in zip(product_names, prices)
+        if name in product_ids
+    ]
+    return enqueue_price_updates(updates)
+
+def real_time_pricing_system(agriculture_platform, product_name, predict_price, demand_forecast=None):
     # Fetch the latest supply and demand data
-    current_supply = agriculture_platform.get_current_supply(product_name)
-    current_demand = agriculture_platform.get_current_demand(product_name)
+    supplies, demands = get_current_supply_and_demand(agriculture_platform, [product_name])
+    current_supply, current_demand = supplies[0], demands[0]
     
     # Get the current month
     current_month = datetime.now().month
     
     # Fetch the latest demand forecast
-    forecasted_demand = agriculture_platform.get_demand_forecast(product_name)
+    forecasted_demand = get_demand_forecasts(demand_forecast or {}, [product_name])[0]
     
     # Calculate the base price using the dynamic pricing model
     base_price = predict_price(current_supply, current_demand, current_month)
@@ -242,7 +467,7 @@ def real_time_pricing_system(agriculture_platform, product_name, predict_price):
         adjustment_factor = 1.0  # No change
     
     # Apply seasonal adjustments if needed
-    seasonal_factor = agriculture_platform.get_seasonal_factor(product_name, current_month)
+    seasonal_factor = feature_store.seasonal_factor(product_name, current_month)
     
     # Calculate the final price
     final_price = base_price * adjustment_factor * seasonal_factor
@@ -251,7 +476,7 @@ def real_time_pricing_system(agriculture_platform, product_name, predict_price):
     final_price = round(final_price, 2)
     
     # Update the price on the platform
-    agriculture_platform.update_product_price(product_name, final_price)
+    persist_prices([product_name], [final_price])
     
     print(f"Updated price for {product_name}: ${final_price:.2f}")
     print(f"Current supply: {current_supply}, Current demand: {current_demand}")
@@ -261,15 +486,52 @@ def real_time_pricing_system(agriculture_platform, product_name, predict_price):
 
 # Example usage
 product_name = 'tomatoes'
-updated_price = real_time_pricing_system(agriculture_platform, product_name, predict_price)
+updated_price = real_time_pricing_system(agriculture_platform, product_name, predict_price, weekly_demand_forecast)
+
+# Catalogue-wide version of real_time_pricing_system: the same pricing rules applied
+# to aligned arrays for every product, with one bulk price update at the end
+def catalogue_pricing_system(agriculture_platform, predict_price, demand_forecast=None, product_names=None):
+    if product_names is None:
+        product_names = list(agriculture_platform['product_name'].unique())
+
+    # Get the current month
+    current_month = datetime.now().month
+
+    # Fetch supply, demand, forecast and seasonal factors for all products at once
+    current_supply, current_demand = get_current_supply_and_demand(agriculture_platform, product_names)
+    forecasted_demand = get_demand_forecasts(demand_forecast or {}, product_names)
+    seasonal_factor = feature_store.seasonal_factors(product_names, current_month)
+
+    # Calculate the base prices in one model call
+    base_price = predict_price(current_supply, current_demand, current_month)
+
+    # Lower prices on surplus, raise them on scarcity (the same 5% rule as above)
+    adjustment_factor = np.where(
+        current_supply > current_demand, 0.95,
+        np.where(current_demand > current_supply, 1.05, 1.0)
+    )
+
+    # Calculate the final prices and round them to two decimal places
+    final_price = np.round(base_price * adjustment_factor * seasonal_factor, 2)
+
+    # Update all prices on the platform in one bulk write
+    persist_prices(product_names, final_price)
+
+    print(f"Updated prices for {len(product_names)} products")
+
+    return pd.DataFrame({
+        'product_name': product_names,
+        'current_supply': current_supply,
+        'current_demand': current_demand,
+        'forecasted_demand': forecasted_demand,
+        'price': final_price,
+    })
 
 # You can schedule this function to run periodically (e.g., hourly) to keep prices updated
 # For example, using a task scheduler like Celery:
 @shared_task
 def update_prices_task():
-    products = agriculture_platform.get_all_products()
-    for product in products:
-        real_time_pricing_system(agriculture_platform, product.name, predict_price)
+    catalogue_pricing_system(agriculture_platform, predict_price, weekly_demand_forecast)
 
 # Schedule the task to run every hour
 update_prices_task.apply_async(countdown=3600)
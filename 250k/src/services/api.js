@@ -12,3 +12,15 @@ export const updatePrice = async (productId) => {
   return response.data;
 };
 
+
+export const getRecentPrices = async (productId) => {
+  const response = await axios.get(`${API_URL}/recent-prices/${productId}/`);
+  return response.data;
+};
+
+export const getPriceHistory = async (productId, { start, end, resolution = 'day', cursor } = {}) => {
+  const response = await axios.get(`${API_URL}/price-history/${productId}/`, {
+    params: { start, end, resolution, cursor },
+  });
+  return response.data;
+};
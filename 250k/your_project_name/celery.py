@@ -1,8 +1,11 @@
 import os
 from celery import Celery
+from agri_app.serialization import register_pricepack
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'your_project_name.settings')
 
+register_pricepack()
+
 app = Celery('your_project_name')
 app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
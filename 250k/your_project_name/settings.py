@@ -22,15 +22,51 @@ DATABASES = {
     )
 }
 
+# Read replicas: comma-separated database URLs. Two local databases are enough to
+# exercise the router, e.g. DATABASE_REPLICA_URLS=sqlite:///replica.sqlite3
+for index, url in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(','))):
+    DATABASES[f'replica_{index}'] = dj_database_url.parse(url, conn_max_age=600)
+    DATABASES[f'replica_{index}']['TEST'] = {'MIRROR': 'default'}
+
+REPLICA_DATABASES = [alias for alias in DATABASES if alias.startswith('replica_')]
+DATABASE_ROUTERS = ['agri_app.db_routers.PrimaryReplicaRouter']
+
+# Seconds a client keeps reading from the primary after it writes
+REPLICATION_LAG_SECONDS = int(os.environ.get('REPLICATION_LAG_SECONDS', 5))
+
+MIDDLEWARE = [
+    # ... existing middleware ...
+    'agri_app.db_routers.primary_pinning_middleware',
+]
+
 # Cache configuration
+# Shared by the web processes and the Celery workers (price tape, demand forecasts),
+# so it must not be a per-process cache
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL', 'redis://localhost:6379'),
     }
 }
+# Recent-price tapes are appended in place by a Lua script, so they use a plain Redis client
+PRICE_TAPE_REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379')
 
 # Celery configuration
 CELERY_BROKER_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379')
 CELERY_RESULT_BACKEND = os.environ.get('REDIS_URL', 'redis://localhost:6379')
+# High-volume task profile, as in agri_marketplace/settings.py. Results are only
+# stored when a caller asks for them.
+CELERY_TASK_IGNORE_RESULT = True
+# Price tasks are sent with the pricepack serializer registered in celery.py
+CELERY_ACCEPT_CONTENT = ['json', 'pricepack']
+CELERY_TASK_ROUTES = {
+    'agri_app.tasks.update_product_price': {'queue': 'pricing'},
+    'agri_app.tasks.update_product_prices_batch': {'queue': 'pricing'},
+    'agri_app.tasks.reprice_product': {'queue': 'pricing'},
+    # reprice_products runs the model for up to 1000 products, so it stays on the
+    # default queue with the other long jobs
+}
+# Prefetch is set per worker; run one worker per queue as in the Procfile
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
 
 # ... rest of your settings ...